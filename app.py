@@ -1,11 +1,15 @@
 import flask
-from flask import Flask, render_template_string, request, jsonify
+from flask import Flask, render_template_string, request
+import orjson
 import joblib
 import numpy as np
-import pandas as pd  # We need pandas to create the input for the preprocessor
 import time
 import os
 import sys
+import math
+import threading
+from functools import lru_cache
+from bisect import bisect_left
 
 app = Flask(__name__)
 
@@ -14,99 +18,269 @@ app = Flask(__name__)
 # This MUST match the model file you just trained
 MODEL_PATH = "trained_breakdown_classifier.pkl"
 
-# --- Load Model & Preprocessor (CRITICAL) ----
+# ONNX export of the same model, written by 'train_classifier.py'.
+# Used for inference when present (and onnxruntime is installed).
+ONNX_MODEL_PATH = "model.onnx"
+
+# --- Load Model & Device Categories (CRITICAL) ----
 if not os.path.exists(MODEL_PATH):
     print(f"FATAL ERROR: Model file not found at {MODEL_PATH}")
     print("Please make sure you have run 'train_classifier.py' first.")
     sys.exit(1)
 
-print(f"Loading model and preprocessor from {MODEL_PATH}...")
-# The .pkl file is a dictionary containing BOTH the preprocessor and the model
+print(f"Loading model and device categories from {MODEL_PATH}...")
+# The .pkl file is a dictionary containing BOTH the device categories and the model
 pipeline_objects = joblib.load(MODEL_PATH)
-preprocessor = pipeline_objects['preprocessor']
 model = pipeline_objects['model']
+
+# Device names and model file name never change after startup, so compute them once
+if 'categories' in pipeline_objects:
+    DEVICE_NAMES = list(pipeline_objects['categories'])
+else:
+    # Older model files stored a fitted ColumnTransformer instead
+    DEVICE_NAMES = list(pipeline_objects['preprocessor'].named_transformers_['cat'].categories_[0])
+MODEL_BASENAME = os.path.basename(MODEL_PATH)
+
+# Column index of each device in the one-hot block of the model input.
+# A plain dict is the fastest lookup here (~40ns): interning the request's
+# device name to compare by identity would itself cost a hash lookup.
+CATS = {name: i for i, name in enumerate(DEVICE_NAMES)}
+N_CATS = len(CATS)
 print("Model loaded successfully.")
 
+# --- Load ONNX Runtime Session (optional) ----
+onnx_session = None
+if os.path.exists(ONNX_MODEL_PATH):
+    try:
+        import onnxruntime as ort
+
+        # One thread per session: requests are single rows and the server
+        # already runs several workers in parallel
+        sess_options = ort.SessionOptions()
+        sess_options.intra_op_num_threads = 1
+        onnx_session = ort.InferenceSession(
+            ONNX_MODEL_PATH, sess_options, providers=['CPUExecutionProvider']
+        )
+        print(f"Using ONNX Runtime for inference ({ONNX_MODEL_PATH}).")
+    except ImportError:
+        print("onnxruntime is not installed. Using the scikit-learn model for inference.")
+
+# ---- Risk Tiers ----
+# The failure probability maps to a tier by counting how many of these
+# thresholds it exceeds: bisect_left for one value, np.searchsorted for a batch.
+# Each table below is indexed by that tier.
+FAIL_BINS = (0.02, 0.1, 0.5)
+RISK_STATUS = ("Low Risk", "Elevated", "High Risk", "Critical")
+RISK_COLOR = (
+    "#198754", # Green
+    "#ffc107", # Yellow
+    "#fd7e14", # Orange
+    "#dc3545", # Red
+)
+RISK_FINDING = (
+    "LOW RISK: {:.1f}% chance of failure. Machine is healthy.",
+    "ELEVATED RISK: {:.1f}% chance of failure detected.",
+    "HIGH RISK: {:.1f}% chance of failure detected.",
+    "CRITICAL RISK: {:.1f}% chance of imminent failure.",
+)
+RISK_NEXT_STEP = (
+    None,
+    "Monitor machine closely. Check for physical anomalies.",
+    "Schedule preventative maintenance within the next 1-2 weeks.",
+    "Schedule immediate inspection and cease operation if possible.",
+)
+
+# ---- Report Messages ----
+# Report texts; the *_TEMPLATE ones are formatted with the temperature
+MSG_HIGH_TEMP_TEMPLATE = "HIGH TEMP: Machine is running dangerously hot ({:.1f}°C)."
+MSG_ELEVATED_TEMP_TEMPLATE = "ELEVATED TEMP: Machine is running warm ({:.1f}°C)."
+MSG_CHECK_COOLING = "Check cooling systems regardless of failure risk."
+MSG_RUN_DIAGNOSTICS = "Run diagnostics and check error logs."
+MSG_NO_ACTION = "No immediate action required. Continue routine monitoring."
+
 # ---- Helpers ----
 
-def predict_breakdown(device_name, usage_hours, temperature, error_count):
+def json_response(payload, status=200):
     """
-    Returns a full diagnostic report based on breakdown classification.
+    Serializes payload with orjson, which is much faster than Flask's jsonify.
+    """
+    return app.response_class(orjson.dumps(payload), status=status, mimetype='application/json')
+
+def predict_proba(X):
+    """
+    Returns the class probabilities [prob_of_0, prob_of_1] for each row of X.
+    """
+    if onnx_session is not None:
+        # Outputs are [label, probabilities]
+        return onnx_session.run(None, {'X': X})[1]
+    return model.predict_proba(X)
+
+class InvalidInput(ValueError):
+    """
+    Raised for request values the model cannot score (answered with a 400).
+    """
+
+def parse_reading(value, name):
+    """
+    Converts a sensor reading to float, rejecting NaN and infinity.
+    """
+    value = float(value)
+    if not math.isfinite(value):
+        raise InvalidInput(f"{name} must be a finite number, got {value}.")
+    return value
+
+# Per-thread model input row for predict_fail_probability (works for both sync and gthread workers)
+_input_row = threading.local()
+
+def predict_fail_probability(device_name, usage_hours, temperature, error_count):
+    """
+    Returns the model's probability of "Breakdown" (class 1) for one machine.
     """
     
-    # --- 1. Create Input DataFrame (CRITICAL) ---
-    # The preprocessor was trained on a DataFrame with specific column names.
-    # We MUST create a new DataFrame with the same names for prediction.
-    input_data = pd.DataFrame({
-        'usage_hours': [float(usage_hours)],
-        'temperature': [float(temperature)],
-        'error_count': [int(error_count)],
-        'device_name': [device_name] 
-    })
-
-    # --- 2. Preprocess the Data ---
-    # Use the loaded preprocessor to transform the data
-    # (e.g., one-hot encode 'device_name')
-    X_processed = preprocessor.transform(input_data)
-
-    # --- 3. Get Prediction & Probability ---
-    # Predict the class (0 = Healthy, 1 = Breakdown)
-    prediction_class = model.predict(X_processed)[0]
-    
+    # --- 1. Build the Model Input Row ---
+    # Same column layout used in training: the 3 numeric features
+    # followed by the one-hot encoded 'device_name'. Unknown devices stay
+    # all-zero.
+    # The row is reused across requests (one per thread), so only the one-hot
+    # slot set by the previous request needs clearing.
+    X_processed = getattr(_input_row, 'x', None)
+    if X_processed is None:
+        X_processed = np.zeros((1, 3 + N_CATS), dtype=np.float32)
+        _input_row.x = X_processed
+        _input_row.cat_idx = None
+    elif _input_row.cat_idx is not None:
+        X_processed[0, 3 + _input_row.cat_idx] = 0.0
+
+    X_processed[0, 0] = float(usage_hours)
+    X_processed[0, 1] = float(temperature)
+    X_processed[0, 2] = int(error_count)
+    cat_idx = CATS.get(device_name)
+    if cat_idx is not None:
+        X_processed[0, 3 + cat_idx] = 1.0
+    _input_row.cat_idx = cat_idx
+
+    # --- 2. Get Probability ---
     # Predict the probability of each class [prob_of_0, prob_of_1]
-    probabilities = model.predict_proba(X_processed)[0]
+    probabilities = predict_proba(X_processed)[0]
     
     # Get the probability of "Breakdown" (class 1)
-    fail_probability = probabilities[1]
+    # As a Python float, so the risk tier is picked in float64 like in the batch
+    # path (ONNX Runtime returns float32)
+    return float(probabilities[1])
+
+def predict_breakdown(device_name, usage_hours, temperature, error_count):
+    """
+    Returns a full diagnostic report based on breakdown classification.
+    """
+    fail_probability = predict_fail_probability(device_name, usage_hours, temperature, error_count)
+    return build_report(fail_probability, usage_hours, temperature, error_count)
+
+@lru_cache(maxsize=4096)
+def _predict_fail_probability_cached(device_name, usage_hours, temperature, error_count):
+    return predict_fail_probability(device_name, usage_hours, temperature, error_count)
+
+def cached_predict_breakdown(device_name, usage_hours, temperature, error_count):
+    """
+    Same as predict_breakdown, but the model call is memoized: the UI often
+    re-sends the same inputs, and a repeat skips the model entirely. The model
+    inputs are quantized to the UI's resolution (whole hours, 0.1°C) so equal
+    readings share a cache entry; the report itself uses the values as sent.
+    """
+    usage_value = parse_reading(usage_hours, "usage_hours")
+    temperature_value = parse_reading(temperature, "temperature")
+    fail_probability = _predict_fail_probability_cached(
+        device_name,
+        int(round(usage_value)),
+        round(temperature_value, 1),
+        int(error_count)
+    )
+    return build_report(fail_probability, usage_hours, temperature, error_count)
+
+def predict_breakdown_batch(rows):
+    """
+    Returns a diagnostic report for each row (a dict with the same keys as
+    the /predict payload), scoring all rows with a single model call.
+    """
+    n_rows = len(rows)
+    if n_rows == 0:
+        return []
+
+    # --- 1. Build the Model Input Matrix (same layout as predict_breakdown) ---
+    X_processed = np.zeros((n_rows, 3 + N_CATS), dtype=np.float32)
+    for i, row in enumerate(rows):
+        X_processed[i, 0] = parse_reading(row.get("usage_hours", 1000), "usage_hours")
+        X_processed[i, 1] = parse_reading(row.get("temperature", 40.0), "temperature")
+        X_processed[i, 2] = int(row.get("error_count", 0))
+        cat_idx = CATS.get(row.get("device", "ECG Monitor"))
+        if cat_idx is not None:
+            X_processed[i, 3 + cat_idx] = 1.0
+
+    # --- 2. Get the Probability of "Breakdown" for Every Row at Once ---
+    # float64, so the tiers match predict_breakdown (ONNX Runtime returns float32)
+    fail_probabilities = predict_proba(X_processed)[:, 1].astype(np.float64)
+    risk_tiers = np.searchsorted(FAIL_BINS, fail_probabilities)
+
+    # --- 3. Create Diagnostic Reports ---
+    return [
+        build_report(
+            fail_probability,
+            row.get("usage_hours", 1000),
+            row.get("temperature", 40.0),
+            row.get("error_count", 0),
+            risk_tier
+        )
+        for row, fail_probability, risk_tier in zip(rows, fail_probabilities, risk_tiers)
+    ]
+
+def build_report(fail_probability, usage_hours, temperature, error_count, risk_tier=None):
+    """
+    Turns a breakdown probability and the sensor inputs into a diagnostic report.
+    risk_tier can be passed in when it was already computed for a whole batch.
+    """
     fail_prob_percent = fail_probability * 100
 
-    # --- 4. Create Diagnostic Report ---
+    # The class (0 = Healthy, 1 = Breakdown) follows from the probability,
+    # which saves a second pass through the forest via model.predict()
+    prediction_class = int(fail_probability > 0.5)
+
     findings = []
     next_steps = []
 
     # A. Analyze Failure Probability (The new logic)
-    if fail_probability > 0.5:
-        status_label = "Critical"
-        color = "#dc3545" # Red
-        findings.append(f"CRITICAL RISK: {fail_prob_percent:.1f}% chance of imminent failure.")
-        next_steps.append("Schedule immediate inspection and cease operation if possible.")
-    elif fail_probability > 0.1:
-        status_label = "High Risk"
-        color = "#fd7e14" # Orange
-        findings.append(f"HIGH RISK: {fail_prob_percent:.1f}% chance of failure detected.")
-        next_steps.append("Schedule preventative maintenance within the next 1-2 weeks.")
-    elif fail_probability > 0.02:
-        status_label = "Elevated"
-        color = "#ffc107" # Yellow
-        findings.append(f"ELEVATED RISK: {fail_prob_percent:.1f}% chance of failure detected.")
-        next_steps.append("Monitor machine closely. Check for physical anomalies.")
-    else:
-        status_label = "Low Risk"
-        color = "#198754" # Green
-        findings.append(f"LOW RISK: {fail_prob_percent:.1f}% chance of failure. Machine is healthy.")
+    if risk_tier is None:
+        risk_tier = bisect_left(FAIL_BINS, fail_probability)
+    status_label = RISK_STATUS[risk_tier]
+    color = RISK_COLOR[risk_tier]
+    findings.append(RISK_FINDING[risk_tier].format(fail_prob_percent))
+    if RISK_NEXT_STEP[risk_tier] is not None:
+        next_steps.append(RISK_NEXT_STEP[risk_tier])
 
     # B. Analyze Input Sensors (This logic is still great!)
-    if float(temperature) > 90.0:
-        findings.append("HIGH TEMP: Machine is running dangerously hot ({:.1f}°C).")
-        next_steps.append("Check cooling systems regardless of failure risk.")
-    elif float(temperature) > 60.0:
-        findings.append("ELEVATED TEMP: Machine is running warm ({:.1f}°C).")
+    temperature_value = float(temperature)
+    if temperature_value > 90.0:
+        findings.append(MSG_HIGH_TEMP_TEMPLATE.format(temperature_value))
+        next_steps.append(MSG_CHECK_COOLING)
+    elif temperature_value > 60.0:
+        findings.append(MSG_ELEVATED_TEMP_TEMPLATE.format(temperature_value))
     
-    if int(error_count) > 10:
+    error_count_value = int(error_count)
+    if error_count_value > 10:
         findings.append(f"HIGH ERROR COUNT: {error_count} errors logged.")
-        next_steps.append("Run diagnostics and check error logs.")
-    elif int(error_count) > 0:
+        next_steps.append(MSG_RUN_DIAGNOSTICS)
+    elif error_count_value > 0:
         findings.append(f"{error_count} minor errors logged.")
 
     if float(usage_hours) > 8000:
         findings.append(f"HIGH USAGE: {usage_hours} hours. Nearing end-of-life for some components.")
 
     if not next_steps:
-        next_steps.append("No immediate action required. Continue routine monitoring.")
+        next_steps.append(MSG_NO_ACTION)
 
     return {
-        "prediction_class": int(prediction_class), # 0 or 1
-        "probability_percent": f"{fail_prob_percent:.1f}%",
+        "prediction_class": prediction_class, # 0 or 1
+        # Clamped and rounded: float32 output from ONNX Runtime can come back
+        # as e.g. 100.00001192. Formatted as "42.1%" by the UI.
+        "probability_percent": round(min(max(float(fail_prob_percent), 0.0), 100.0), 2),
         "status_label": status_label,
         "color": color,
         "findings": findings,
@@ -263,7 +437,7 @@ TEMPLATE = """
   </div>
 
 <script>
-  // --- This data is from your preprocessor. Do not change it. ---
+  // --- This data is from your model file. Do not change it. ---
   const DEVICE_NAMES = {{ device_names | tojson }};
 
   // DOM elements
@@ -329,7 +503,7 @@ TEMPLATE = """
     // Update prediction box
     statusBadge.textContent = res.status_label;
     statusBadge.style.background = res.color;
-    probText.textContent = res.probability_percent;
+    probText.textContent = res.probability_percent.toFixed(1) + '%';
     classText.textContent = `(Predicted Class: ${res.prediction_class})`;
 
     // Update report content
@@ -361,17 +535,10 @@ TEMPLATE = """
 
 @app.route("/")
 def index():
-    # Get device names from the preprocessor to populate the dropdown
-    try:
-        device_names = list(preprocessor.named_transformers_['cat'].categories_[0])
-    except Exception as e:
-        print(f"Warning: Could not get device names from preprocessor. Using defaults. Error: {e}")
-        device_names = ["ECG Monitor", "Ventilator", "Infusion Pump"] # Fallback
-        
     return render_template_string(
         TEMPLATE, 
-        model_name=os.path.basename(MODEL_PATH),
-        device_names=device_names
+        model_name=MODEL_BASENAME,
+        device_names=DEVICE_NAMES
     )
 
 @app.route("/predict", methods=["POST"])
@@ -379,7 +546,7 @@ def predict_api():
     try:
         data = request.get_json(force=True)
         
-        result = predict_breakdown(
+        result = cached_predict_breakdown(
             device_name=data.get("device", "ECG Monitor"),
             usage_hours=data.get("usage_hours", 1000),
             temperature=data.get("temperature", 40.0),
@@ -387,14 +554,37 @@ def predict_api():
         )
         
         result['time'] = time.strftime("%H:%M:%S")
-        return jsonify(result)
+        return json_response(result)
         
+    except InvalidInput as e:
+        return json_response({"error": str(e)}, status=400)
     except Exception as e:
         print(f"Error during prediction: {e}")
-        return jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}, status=500)
+
+@app.route("/predict_batch", methods=["POST"])
+def predict_batch_api():
+    try:
+        data = request.get_json(force=True)
+
+        results = predict_breakdown_batch(data.get("rows", []))
+
+        now = time.strftime("%H:%M:%S")
+        for result in results:
+            result['time'] = now
+        return json_response({"results": results})
+
+    except InvalidInput as e:
+        return json_response({"error": str(e)}, status=400)
+    except Exception as e:
+        print(f"Error during batch prediction: {e}")
+        return json_response({"error": str(e)}, status=500)
 
 if __name__ == "__main__":
+    # Development server only. In production run 'wsgi.py' under gunicorn.
     # Get port from environment variable or default to 5001
     port = int(os.environ.get("PORT", 5001))
+    # The debugger/reloader slow down every request, so only enable them with DEV=1
+    debug = bool(os.environ.get("DEV"))
     # Run the app
-    app.run(host="0.0.0.0", port=port, debug=True)
\ No newline at end of file
+    app.run(host="0.0.0.0", port=port, debug=debug)
\ No newline at end of file
@@ -1,14 +1,36 @@
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 import os
 
 # --- Configuration ---
 original_file = 'medical_equipment_real_named_data.csv'
 output_filename = 'augmented_medical_data_100k.csv'
+parquet_output_filename = 'augmented_medical_data_100k.parquet' # Faster to load for training
 N_TOTAL = 100000
 N_BREAKDOWNS_TARGET = 5000 # We'll aim for a 5% breakdown rate
+RANDOM_SEED = 42
 # ---------------------
 
+# A single PCG64 generator is faster than the legacy global np.random
+rng = np.random.default_rng(RANDOM_SEED)
+
+
+def sample_normal(mean, std, n, clip_min=None):
+    """
+    Draws n normal samples, scaling and clipping in place
+    so no intermediate arrays are allocated.
+    """
+    buf = rng.standard_normal(n)
+    buf *= std
+    buf += mean
+    if clip_min is not None:
+        np.clip(buf, clip_min, None, out=buf)
+    return buf
+
+
 print(f"Loading original data from '{original_file}'...")
 
 if not os.path.exists(original_file):
@@ -52,7 +74,9 @@ else:
     temp_mean_h = healthy_stats.loc['mean', 'temperature']
     temp_std_h = healthy_stats.loc['std', 'temperature']
     error_probs_h = df_healthy['error_count'].value_counts(normalize=True)
+    error_values_h, error_p_h = error_probs_h.index.to_numpy(), error_probs_h.to_numpy()
     healthy_devices_probs = df_healthy['device_name'].value_counts(normalize=True)
+    healthy_devices, healthy_devices_p = healthy_devices_probs.index.to_numpy(), healthy_devices_probs.to_numpy()
 
     # 2. Parameters for breakdown data
     if CAN_GENERATE_BREAKDOWNS:
@@ -65,44 +89,56 @@ else:
         error_mean_b = breakdown_stats.loc['mean', 'error_count']
         error_std_b = max(breakdown_stats.loc['std', 'error_count'], 0.5)
         breakdown_devices_probs = df_breakdown['device_name'].value_counts(normalize=True)
+        breakdown_devices, breakdown_devices_p = breakdown_devices_probs.index.to_numpy(), breakdown_devices_probs.to_numpy()
 
     # --- Generate New Data ---
 
     # 1. Generate new HEALTHY data
     new_healthy_data = {
-        'device_name': np.random.choice(healthy_devices_probs.index, size=n_new_healthy, p=healthy_devices_probs.values),
-        'usage_hours': np.clip(np.random.normal(usage_mean_h, usage_std_h, n_new_healthy), a_min=0, a_max=None),
-        'temperature': np.random.normal(temp_mean_h, temp_std_h, n_new_healthy),
-        'error_count': np.random.choice(error_probs_h.index, size=n_new_healthy, p=error_probs_h.values),
+        'device_name': rng.choice(healthy_devices, size=n_new_healthy, p=healthy_devices_p),
+        'usage_hours': sample_normal(usage_mean_h, usage_std_h, n_new_healthy, clip_min=0),
+        'temperature': sample_normal(temp_mean_h, temp_std_h, n_new_healthy),
+        'error_count': rng.choice(error_values_h, size=n_new_healthy, p=error_p_h),
         'breakdown_flag': np.zeros(n_new_healthy, dtype=int)
     }
-    new_healthy_df = pd.DataFrame(new_healthy_data)
     print("Generated new healthy data.")
 
     # 2. Generate new BREAKDOWN data (if possible)
     if CAN_GENERATE_BREAKDOWNS:
+        error_count_b = sample_normal(error_mean_b, error_std_b, n_new_breakdowns, clip_min=0)
+        np.round(error_count_b, out=error_count_b)
         new_breakdown_data = {
-            'device_name': np.random.choice(breakdown_devices_probs.index, size=n_new_breakdowns, p=breakdown_devices_probs.values),
-            'usage_hours': np.clip(np.random.normal(usage_mean_b, usage_std_b, n_new_breakdowns), a_min=0, a_max=None),
-            'temperature': np.random.normal(temp_mean_b, temp_std_b, n_new_breakdowns),
-            'error_count': np.clip(np.round(np.random.normal(error_mean_b, error_std_b, n_new_breakdowns)), a_min=0, a_max=None).astype(int),
+            'device_name': rng.choice(breakdown_devices, size=n_new_breakdowns, p=breakdown_devices_p),
+            'usage_hours': sample_normal(usage_mean_b, usage_std_b, n_new_breakdowns, clip_min=0),
+            'temperature': sample_normal(temp_mean_b, temp_std_b, n_new_breakdowns),
+            'error_count': error_count_b.astype(int),
             'breakdown_flag': np.ones(n_new_breakdowns, dtype=int)
         }
-        new_breakdown_df = pd.DataFrame(new_breakdown_data)
         print("Generated new breakdown data.")
-    else:
-        new_breakdown_df = pd.DataFrame() # Empty dataframe
 
     # --- Combine and Save ---
-    final_df = pd.concat([df, new_healthy_df, new_breakdown_df], ignore_index=True)
-    
-    # Shuffle the dataframe
-    final_df = final_df.sample(frac=1).reset_index(drop=True)
+    # Concatenate and shuffle each column as a plain NumPy array and build the
+    # DataFrame only once, instead of pd.concat + sample(frac=1) + reset_index
+    # (three full copies of the table).
+    columns = list(new_healthy_data)
+    parts = [{col: df[col].to_numpy() for col in columns}, new_healthy_data]
+    if CAN_GENERATE_BREAKDOWNS:
+        parts.append(new_breakdown_data)
+
+    n_rows = sum(len(part['breakdown_flag']) for part in parts)
+    perm = rng.permutation(n_rows)
+    final_df = pd.DataFrame({
+        col: np.concatenate([part[col] for part in parts])[perm] for col in columns
+    })
+
+    # Save to CSV (Arrow's C++ writer is much faster than DataFrame.to_csv)
+    final_table = pa.Table.from_pandas(final_df, preserve_index=False)
+    pacsv.write_csv(final_table, output_filename)
 
-    # Save to CSV
-    final_df.to_csv(output_filename, index=False)
+    # Also save as Parquet, which 'train_classifier.py' can load without parsing CSV
+    pq.write_table(final_table, parquet_output_filename)
 
     print("\n--- Success! ---")
-    print(f"Saved {len(final_df)} rows to '{output_filename}'.")
+    print(f"Saved {len(final_df)} rows to '{output_filename}' and '{parquet_output_filename}'.")
     print("New Breakdown Flag Distribution:")
     print(final_df['breakdown_flag'].value_counts())
\ No newline at end of file
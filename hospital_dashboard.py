@@ -6,9 +6,17 @@ import joblib
 from datetime import datetime
 
 # ---------------- LOAD MODEL ---------------- #
-model = joblib.load("trained_rul_model.pkl")
+# Cached across Streamlit reruns, so the model is only loaded once per process
+@st.cache_resource
+def load_model():
+    return joblib.load("trained_rul_model.pkl")
 
 st.set_page_config(page_title="Hospital IoT & Predictive Maintenance Dashboard", layout="wide")
+model = load_model()
+
+# One generator for the whole simulation (faster than the legacy np.random calls)
+rng = np.random.default_rng()
+
 st.title("🏥 Real-Time Patient Monitoring + Medical Equipment Health Prediction")
 
 # ---------------- LEFT SECTION: PATIENT VITALS ---------------- #
@@ -32,19 +40,22 @@ sim_interval = st.sidebar.number_input("Refresh Every (seconds)", min_value=1, m
 machine_placeholder = st.empty()
 
 def generate_machine_data():
+    usage_hours, temperature = rng.uniform([100, 25], [9000, 90])
     return {
-        "usage_hours": np.random.uniform(100, 9000),
-        "temperature": np.random.uniform(25, 90),
-        "error_count": np.random.randint(0, 10)
+        "usage_hours": usage_hours,
+        "temperature": temperature,
+        "error_count": rng.integers(0, 10)
     }
 
 history = []
 
 while True:
     # ------------ PATIENT DATA UPDATE ------------ #
-    heart_rate += np.random.randint(-2, 3)
-    oxygen += np.random.randint(-1, 2)
-    temp += round(np.random.uniform(-0.1, 0.1), 2)
+    # Both integer steps are drawn in one call: heart rate in [-2, 2], oxygen in [-1, 1]
+    hr_step, oxygen_step = rng.integers([-2, -1], [3, 2])
+    heart_rate += hr_step
+    oxygen += oxygen_step
+    temp += round(rng.uniform(-0.1, 0.1), 2)
 
     patient_data = pd.DataFrame([{
         "Heart Rate (BPM)": heart_rate,
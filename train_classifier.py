@@ -1,52 +1,56 @@
 import pandas as pd
+import numpy as np
 from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score, classification_report
-from sklearn.preprocessing import OneHotEncoder
-from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
+from sklearn.metrics import accuracy_score, classification_report, f1_score, roc_auc_score
 import joblib
 import os
 import sys
 
 # --- 1. Load Data ---
 data_file = 'augmented_medical_data_100k.csv'
-if not os.path.exists(data_file):
+# Written next to the CSV by 'generate_data.py'; much faster to load.
+# Only used when it is at least as new as the CSV (or there is no CSV),
+# so a CSV replaced by hand is never shadowed by stale Parquet data.
+parquet_data_file = 'augmented_medical_data_100k.parquet'
+
+use_parquet = os.path.exists(parquet_data_file) and (
+    not os.path.exists(data_file)
+    or os.path.getmtime(parquet_data_file) >= os.path.getmtime(data_file)
+)
+
+if use_parquet:
+    print(f"Loading data from {parquet_data_file}...")
+    df = pd.read_parquet(parquet_data_file)
+elif os.path.exists(data_file):
+    print(f"Loading data from {data_file}...")
+    # The pyarrow engine parses the columns in parallel
+    df = pd.read_csv(data_file, engine='pyarrow')
+else:
     print(f"FATAL ERROR: Data file not found at '{data_file}'")
     print("Please make sure it's in the same folder as this script.")
     sys.exit(1)
-    
-print(f"Loading data from {data_file}...")
-df = pd.read_csv(data_file)
 
-# --- 2. Define Features (X) and Target (y) ---
+# --- 2. Define the Target (y) ---
 # The target (y) is what we want to predict
 y = df['breakdown_flag']
 
-# The features (X) are the inputs used for prediction
-# We drop the target column
-X = df.drop('breakdown_flag', axis=1)
-
 # --- 3. Preprocessing (CRITICAL STEP) ---
 # ML models only understand numbers. We must convert 'device_name' (text)
-# into numerical columns using OneHotEncoder.
+# into numerical columns using one-hot encoding.
+# The feature layout is: the numeric features first, then one column per
+# device (sorted by name). The app builds its input rows the same way.
 
-categorical_features = ['device_name']
 numeric_features = ['usage_hours', 'temperature', 'error_count']
 
-# Create a "preprocessor" that applies the right transform to the right column
-# 'passthrough' means the numeric features will be left alone
-# 'OneHotEncoder' will be applied to the categorical 'device_name'
-preprocessor = ColumnTransformer(
-    transformers=[
-        ('num', 'passthrough', numeric_features),
-        ('cat', OneHotEncoder(handle_unknown='ignore', sparse_output=False), categorical_features)
-    ],
-    remainder='passthrough'
-)
-
 print("Preprocessing data (One-Hot Encoding 'device_name')...")
-# Fit the preprocessor to our data and transform it
-X_processed = preprocessor.fit_transform(X)
+X_num = df[numeric_features].to_numpy(dtype=np.float32)
+
+categories = sorted(df['device_name'].unique())
+cat_idx = {name: i for i, name in enumerate(categories)}
+X_cat = np.eye(len(categories), dtype=np.float32)[df['device_name'].map(cat_idx).to_numpy()]
+
+X_processed = np.hstack([X_num, X_cat])
 
 # --- 4. Split Data ---
 # Split into 80% for training and 20% for testing
@@ -61,17 +65,87 @@ X_train, X_test, y_train, y_test = train_test_split(
 print(f"Training set size: {X_train.shape[0]} samples")
 print(f"Test set size: {X_test.shape[0]} samples")
 
-# --- 5. Train the New Classifier Model ---
-print("Training the RandomForestClassifier...")
-print("(This may take a minute with 100k rows...)")
+# --- 5. Choose the Forest Size ---
+# Prediction time in the app grows with the number (and depth) of trees,
+# so pick the smallest forest that is about as good as the best one.
+# Candidates are scored on a validation split carved out of the training set,
+# using the F1 score of the (rare) breakdown class.
+print("Sweeping n_estimators / max_depth on a validation split...")
+X_fit, X_val, y_fit, y_val = train_test_split(
+    X_train, y_train, test_size=0.2, random_state=42, stratify=y_train
+)
 
-# n_jobs=-1 uses all your computer's cores to train faster
-model = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=-1, max_depth=20)
+F1_TOLERANCE = 0.005 # Accept forests within 0.5 percentage points of the best F1
+
+sweep_results = []
+for n in (25, 50, 75, 100):
+    for d in (8, 12, 16, 20):
+        candidate = RandomForestClassifier(n_estimators=n, random_state=42, n_jobs=-1, max_depth=d)
+        candidate.fit(X_fit, y_fit)
+        f1 = f1_score(y_val, candidate.predict(X_val), pos_label=1)
+        auc = roc_auc_score(y_val, candidate.predict_proba(X_val)[:, 1])
+        sweep_results.append((n, d, f1, auc))
+        print(f"  n_estimators={n:<3} max_depth={d:<2} -> F1 (breakdown) = {f1:.4f}, ROC-AUC = {auc:.4f}")
+
+best_f1 = max(r[2] for r in sweep_results)
+# Results are ordered smallest forest first, so the first good enough one wins
+n_estimators, max_depth, chosen_f1, rf_auc = next(
+    r for r in sweep_results if r[2] >= best_f1 - F1_TOLERANCE
+)
+print(f"Chosen: n_estimators={n_estimators}, max_depth={max_depth} "
+      f"(F1 {chosen_f1:.4f}, best {best_f1:.4f})")
+
+# --- 6. Compare Against HistGradientBoosting ---
+# Gradient boosting on binned features usually gives a smaller model that
+# predicts faster, but only when the app can serve it through ONNX Runtime:
+# through scikit-learn a single-row prediction is far slower than the forest's
+# ONNX path. So it is only used if it converts to ONNX and beats the chosen
+# forest's ROC-AUC; on a tie the forest is kept.
+def make_hgb():
+    return HistGradientBoostingClassifier(max_iter=200, max_depth=8, learning_rate=0.1, random_state=42)
+
+def to_onnx(estimator):
+    """
+    Converts a fitted classifier to ONNX for the app.
+    zipmap=False makes the probabilities come out as a plain float tensor.
+    Raises ImportError if skl2onnx is not installed, or whatever skl2onnx
+    raises if it cannot convert the estimator.
+    """
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+
+    return convert_sklearn(
+        estimator,
+        initial_types=[('X', FloatTensorType([None, X_train.shape[1]]))],
+        options={id(estimator): {'zipmap': False}}
+    )
+
+print("Evaluating HistGradientBoostingClassifier on the validation split...")
+hgb = make_hgb().fit(X_fit, y_fit)
+hgb_auc = roc_auc_score(y_val, hgb.predict_proba(X_val)[:, 1])
+print(f"ROC-AUC: HistGradientBoosting = {hgb_auc:.4f}, RandomForest = {rf_auc:.4f}")
+
+try:
+    to_onnx(hgb)
+    hgb_exportable = True
+except Exception as e:
+    hgb_exportable = False
+    print(f"HistGradientBoosting cannot be exported to ONNX ({type(e).__name__}); keeping the forest.")
+
+# --- 7. Train the New Classifier Model ---
+if hgb_exportable and hgb_auc > rf_auc:
+    print("Training the HistGradientBoostingClassifier...")
+    model = make_hgb()
+else:
+    print("Training the RandomForestClassifier...")
+    # n_jobs=-1 uses all your computer's cores to train faster
+    model = RandomForestClassifier(n_estimators=n_estimators, random_state=42, n_jobs=-1, max_depth=max_depth)
+print("(This may take a minute with 100k rows...)")
 model.fit(X_train, y_train)
 
 print("Training complete.")
 
-# --- 6. Evaluate the Model ---
+# --- 8. Evaluate the Model ---
 # Let's see how well it learned
 print("\n--- Model Evaluation ---")
 y_pred = model.predict(X_test)
@@ -81,16 +155,37 @@ print(f"Accuracy on Test Set: {accuracy * 100:.2f}%")
 print("\nClassification Report:")
 print(classification_report(y_test, y_pred, target_names=['Healthy (0)', 'Breakdown (1)']))
 
-# --- 7. Save the New Model ---
-# We must save BOTH the model AND the preprocessor,
-# otherwise we can't transform new data in the app.
+# --- 9. Save the New Model ---
+# We must save BOTH the model AND the device categories,
+# otherwise we can't encode new data in the app.
 new_model_filename = 'trained_breakdown_classifier.pkl'
 
 pipeline_to_save = {
-    'preprocessor': preprocessor,
+    'categories': categories,
     'model': model
 }
 
-joblib.dump(pipeline_to_save, new_model_filename)
+# lz4 shrinks the file several times over and still decompresses quickly,
+# so the app starts faster when the file has to come from disk
+joblib.dump(pipeline_to_save, new_model_filename, compress=('lz4', 3))
 print(f"\n--- Success! ---")
-print(f"New model and preprocessor saved to '{new_model_filename}'")
\ No newline at end of file
+print(f"New model and device categories saved to '{new_model_filename}'")
+
+# --- 10. Export the Model to ONNX ---
+# The app runs the model through onnxruntime when this file is present,
+# which is much faster than sklearn for single-row predictions.
+onnx_model_filename = 'model.onnx'
+
+try:
+    onnx_model = to_onnx(model)
+except Exception as e: # Includes ImportError when skl2onnx is not installed
+    # Never leave an export of a previous model behind: the app would use it
+    # instead of the model we just saved
+    if os.path.exists(onnx_model_filename):
+        os.remove(onnx_model_filename)
+    print(f"Warning: Could not export the model to ONNX ({type(e).__name__}).")
+    print("The app will use the scikit-learn model instead.")
+else:
+    with open(onnx_model_filename, 'wb') as f:
+        f.write(onnx_model.SerializeToString())
+    print(f"ONNX model saved to '{onnx_model_filename}'")
\ No newline at end of file
@@ -0,0 +1,5 @@
+# WSGI entry point for production servers, e.g.:
+#   gunicorn -w $(nproc) -k sync --preload wsgi:app -b 0.0.0.0:5001
+# --preload loads the model once in the master process before forking, so the
+# workers share its memory pages (copy-on-write) instead of each loading a copy.
+from app import app